@@ -3,46 +3,53 @@ import os
 import struct
 import logging
 import argparse
+from array import array
 
 # Define the header IDs and structures
 COREDUMP_HDR_ID = b'ZE'
 COREDUMP_HDR_VER = 1
 LOG_HDR_STRUCT = "<ccHHBBI"
-LOG_HDR_SIZE = struct.calcsize(LOG_HDR_STRUCT)
+LOG_HDR = struct.Struct(LOG_HDR_STRUCT)
+LOG_HDR_SIZE = LOG_HDR.size
 
 COREDUMP_ARCH_HDR_ID = b'A'
 LOG_ARCH_HDR_STRUCT = "<cHH"
-LOG_ARCH_HDR_SIZE = struct.calcsize(LOG_ARCH_HDR_STRUCT)
+LOG_ARCH_HDR = struct.Struct(LOG_ARCH_HDR_STRUCT)
+LOG_ARCH_HDR_SIZE = LOG_ARCH_HDR.size
+ARCH_SECTION_ID = COREDUMP_ARCH_HDR_ID[0]  # Section ID as compared against view[offset]
 
 COREDUMP_MEM_HDR_ID = b'M'
 COREDUMP_MEM_HDR_VER = 1
 LOG_MEM_HDR_STRUCT = "<cH"
-LOG_MEM_HDR_SIZE = struct.calcsize(LOG_MEM_HDR_STRUCT)
+LOG_MEM_HDR = struct.Struct(LOG_MEM_HDR_STRUCT)
+LOG_MEM_HDR_SIZE = LOG_MEM_HDR.size
+MEM_SECTION_ID = COREDUMP_MEM_HDR_ID[0]
+
+# Start/end address pair following the memory header, by pointer size
+MEM_ADDR_32 = struct.Struct("<II")
+MEM_ADDR_64 = struct.Struct("<QQ")
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
-def parse_memory_section(data, offset, ptr_size):
-    hdr = data[offset:offset+LOG_MEM_HDR_SIZE]
-    _, hdr_ver = struct.unpack(LOG_MEM_HDR_STRUCT, hdr)
+def parse_memory_section(view, offset, ptr_size):
+    _, hdr_ver = LOG_MEM_HDR.unpack_from(view, offset)
 
     if hdr_ver != COREDUMP_MEM_HDR_VER:
         logger.error(f"Memory block version: {hdr_ver}, expected {COREDUMP_MEM_HDR_VER}!")
         return None, offset
 
-    ptr_fmt = "QQ" if ptr_size == 64 else "II"
-    ptr_size_bytes = 8 if ptr_size == 64 else 4
+    addr_struct = MEM_ADDR_64 if ptr_size == 64 else MEM_ADDR_32
 
     offset += LOG_MEM_HDR_SIZE
-    addr_data = data[offset:offset+2*ptr_size_bytes]
-    saddr, eaddr = struct.unpack(ptr_fmt, addr_data)
+    saddr, eaddr = addr_struct.unpack_from(view, offset)
 
     size = eaddr - saddr
 
-    offset += 2*ptr_size_bytes
-    mem_data = data[offset:offset+size]
+    offset += addr_struct.size
 
-    mem = {"start": saddr, "end": eaddr, "size": size, "data": mem_data}
+    # Region data is referenced by its offset into the coredump, never copied
+    mem = (saddr, eaddr, offset)
     
     return mem, offset + size
 
@@ -50,34 +57,43 @@ def analyze_coredump(input_file, output_file, verbose=False):
     try:
         with open(input_file, 'rb') as f:
             data = f.read()
+        view = memoryview(data)
 
         start_pos = data.find(COREDUMP_HDR_ID)
         if start_pos == -1:
             raise ValueError(f"COREDUMP_HDR_ID not found in {input_file}")
 
-        header = struct.unpack(LOG_HDR_STRUCT, data[start_pos:start_pos+LOG_HDR_SIZE])
+        header = LOG_HDR.unpack_from(view, start_pos)
         ptr_size = 2 ** header[4]  # ptr_size is at index 4
         
         offset = start_pos + LOG_HDR_SIZE
-        memory_regions = []
+        arch_header = None  # Not every coredump carries an ARCH section
+
+        # Memory regions as parallel arrays of start address, end address and data offset
+        region_starts = array('Q')
+        region_ends = array('Q')
+        region_offsets = array('Q')
 
         while offset < len(data):
-            section_id = data[offset:offset+1]
+            section_id = view[offset]
             
             # If we reach padding or unknown section ID, stop parsing
-            if section_id == b'\x00':
+            if section_id == 0:
                 logger.info("Reached end or padding. Stopping parsing.")
                 break
             
-            if section_id == COREDUMP_ARCH_HDR_ID:
-                arch_header = struct.unpack(LOG_ARCH_HDR_STRUCT, data[offset:offset+LOG_ARCH_HDR_SIZE])
+            if section_id == ARCH_SECTION_ID:
+                arch_header = LOG_ARCH_HDR.unpack_from(view, offset)
                 offset += LOG_ARCH_HDR_SIZE + arch_header[2]  # Skip ARCH data
-            elif section_id == COREDUMP_MEM_HDR_ID:
-                mem_data, offset = parse_memory_section(data, offset, ptr_size)
-                if mem_data:
-                    memory_regions.append(mem_data)
+            elif section_id == MEM_SECTION_ID:
+                mem, offset = parse_memory_section(view, offset, ptr_size)
+                if mem:
+                    saddr, eaddr, data_offset = mem
+                    region_starts.append(saddr)
+                    region_ends.append(eaddr)
+                    region_offsets.append(data_offset)
             else:
-                logger.warning(f"Unknown section ID: {section_id}")
+                logger.warning(f"Unknown section ID: 0x{section_id:02x}")
                 break
 
         if verbose:
@@ -85,16 +101,17 @@ def analyze_coredump(input_file, output_file, verbose=False):
             logger.info(f"Pointer size: {ptr_size} bits")
             logger.info(f"ARCH Header: {arch_header}")
             logger.info("\nMemory Regions:")
-            for i, region in enumerate(memory_regions, 1):
+            for i, (saddr, eaddr, data_offset) in enumerate(zip(region_starts, region_ends, region_offsets), 1):
+                size = eaddr - saddr
                 logger.info(f"Region {i}:")
-                logger.info(f"  Start address: 0x{region['start']:x}")
-                logger.info(f"  End address: 0x{region['end']:x}")
-                logger.info(f"  Size: {region['size']} bytes")
-                logger.info(f"  Data (first 16 bytes): {region['data'][:16].hex()}")
+                logger.info(f"  Start address: 0x{saddr:x}")
+                logger.info(f"  End address: 0x{eaddr:x}")
+                logger.info(f"  Size: {size} bytes")
+                logger.info(f"  Data (first 16 bytes): {view[data_offset:data_offset + min(size, 16)].hex()}")
                 logger.info("")
 
         with open(output_file, 'wb') as f:
-            f.write(data[start_pos:offset])
+            f.write(view[start_pos:offset])
 
         logger.info(f"Processed coredump saved to {output_file}")
 
@@ -102,8 +119,8 @@ def analyze_coredump(input_file, output_file, verbose=False):
         logger.error(f"Error: The file '{input_file}' does not exist.")
     except ValueError as ve:
         logger.error(f"Error: {ve}")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
+    except (OSError, struct.error) as e:
+        logger.error(f"Error: Failed to process coredump: {e}")
 
 def main():
     parser = argparse.ArgumentParser(description="Analyze and strip coredump file")
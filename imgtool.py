@@ -1,12 +1,24 @@
 # imgtools.py
 
+import errno
+import mmap
 import os
 import shutil
-from pathlib import Path
+from contextlib import contextmanager
 from imgtool_args import ImgToolArgs
 from tempfile import NamedTemporaryFile
 import struct
-import zlib
+
+try:
+    # zlib-ng computes the same CRC-32 with PCLMULQDQ/VPCLMULQDQ folding when available
+    from zlib_ng import zlib_ng as zlib
+except ImportError:
+    import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Optional, calculate_checksum falls back to the built-in sum()
 
 # Sign mode related values
 SIGN_CRC = "crc"
@@ -16,6 +28,12 @@ SIGN_RSA_3072 = "rsa3072"
 SIGN_SIGN_OFF = "off"
 SIGN_RESERVED_VALUE = 0
 
+# Chunk size used when streaming file content and padding, also used as the buffer size of output files
+IO_CHUNK_SIZE = 1 << 20
+
+# One IO_CHUNK_SIZE block of padding per pad byte, shared by all writers
+_PAD_CHUNK_CACHE = {}
+
 
 def parse_hexadecimal(value):
     """Convert hexadecimal string (starting with '0x') or decimal string to integer."""
@@ -25,11 +43,88 @@ def parse_hexadecimal(value):
         raise ValueError(f"Invalid numeric value: {value}")
 
 
+def write_padding(file_out, pad_byte, size):
+    """Write size bytes of pad_byte to file_out in fixed-size chunks."""
+    if size <= 0:
+        return
+
+    chunk = _PAD_CHUNK_CACHE.get(pad_byte)
+    if chunk is None:
+        chunk = _PAD_CHUNK_CACHE[pad_byte] = memoryview(pad_byte * IO_CHUNK_SIZE)
+
+    while size > 0:
+        file_out.write(chunk[:size])
+        size -= len(chunk)
+
+
+def copy_range(file_src, file_dst, offset, count):
+    """Copy count bytes of file_src starting at offset to the current position of file_dst."""
+    if count <= 0:
+        return
+
+    # Hand the copy to the kernel where possible, the data never enters user space
+    if hasattr(os, 'sendfile'):
+        file_dst.flush()
+        dst_fd = file_dst.fileno()
+        try:
+            while count > 0:
+                sent = os.sendfile(dst_fd, file_src.fileno(), offset, count)
+                if sent == 0:
+                    break  # Source is shorter than expected
+                offset += sent
+                count -= sent
+        except OSError as e:
+            # Only fall back when sendfile() does not support regular files as output on this platform
+            if e.errno not in (errno.EINVAL, errno.ENOTSOCK, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise
+        finally:
+            file_dst.seek(os.lseek(dst_fd, 0, os.SEEK_CUR))
+
+    if count <= 0 or os.fstat(file_src.fileno()).st_size <= offset:
+        return
+
+    # Fallback: write the remaining range straight out of a read-only mapping of the source
+    with mmap.mmap(file_src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped)[offset:offset + count] as view:
+            file_dst.write(view)
+
+
+def is_same_path(path_a, path_b):
+    """Check whether two paths refer to the same file, also when one of them does not exist yet."""
+    if os.path.exists(path_a) and os.path.exists(path_b):
+        return os.path.samefile(path_a, path_b)
+    return os.path.abspath(path_a) == os.path.abspath(path_b)
+
+
+@contextmanager
+def open_output(output_path, *input_paths):
+    """Open output_path for writing, staging through a temporary file only when it is also one of the inputs."""
+    if not any(is_same_path(output_path, input_path) for input_path in input_paths):
+        with open(output_path, 'wb', buffering=IO_CHUNK_SIZE) as file_out:
+            yield file_out
+        return
+
+    # Create the temporary file next to the output so it can be renamed into place
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with NamedTemporaryFile(dir=output_dir, delete=False, buffering=IO_CHUNK_SIZE) as temp_file:
+        try:
+            yield temp_file
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        except BaseException:
+            temp_file.close()
+            os.remove(temp_file.name)
+            raise
+
+    # Replace the original file with the temporary file
+    os.replace(temp_file.name, output_path)
+
+
 def resize_binary_file(input_path, output_path, target_size, imgtool_args):
     """Resize a binary file to a specified size and apply alignment."""
     target_size = parse_hexadecimal(target_size)
-    current_size = Path(input_path).stat().st_size
-    PAD_BYTE = bytes([int(imgtool_args.pad_byte, 16)])
+    current_size = os.stat(input_path).st_size
+    PAD_BYTE = imgtool_args.pad_byte_bytes
 
     if imgtool_args.verbose:
         print(f"Resizing to: {target_size} bytes (0x{target_size:x}).")
@@ -40,11 +135,10 @@ def resize_binary_file(input_path, output_path, target_size, imgtool_args):
     padding_size = target_size - current_size
     alignment_padding = (imgtool_args.align - (target_size % imgtool_args.align)) % imgtool_args.align
 
-    with open(output_path, "wb") as file_out:
-        with open(input_path, "rb") as file_in:
-            file_out.write(file_in.read())
-        file_out.write(PAD_BYTE * padding_size)
-        file_out.write(PAD_BYTE * alignment_padding)
+    with open(output_path, "wb", buffering=IO_CHUNK_SIZE) as file_out:
+        with open(input_path, "rb", buffering=IO_CHUNK_SIZE) as file_in:
+            shutil.copyfileobj(file_in, file_out, IO_CHUNK_SIZE)
+        write_padding(file_out, PAD_BYTE, padding_size + alignment_padding)
 
     if imgtool_args.verbose:
         print(f"File resized and aligned to {imgtool_args.align}-byte boundary, final size: {target_size + alignment_padding}(0x{(target_size + alignment_padding):x}) bytes.")
@@ -53,30 +147,23 @@ def resize_binary_file(input_path, output_path, target_size, imgtool_args):
 def append_to_file(base_path, append_path, output_path, offset, imgtool_args):
     """Append content of one file to another at a specified offset and apply alignment, handling same input and output paths safely."""
     offset = parse_hexadecimal(offset)
-    base_size = Path(base_path).stat().st_size
-    PAD_BYTE = bytes([int(imgtool_args.pad_byte, 16)])
+    base_size = os.stat(base_path).st_size
+    PAD_BYTE = imgtool_args.pad_byte_bytes
 
     if offset < base_size:
         raise ValueError(f"Offset {offset}(0x{offset:x}) bytes must be larger than the base file size {base_size}(0x{base_size:x}) bytes.")
 
-    with NamedTemporaryFile(delete=False) as temp_file:
+    with open_output(output_path, base_path, append_path) as file_out:
         with open(base_path, 'rb') as file_base:
-            temp_file.write(file_base.read())  # Write the entire base file to temp
-            temp_file.write(PAD_BYTE * (offset - base_size))  # Pad to the specified offset
+            copy_range(file_base, file_out, 0, base_size)  # Write the entire base file
+            write_padding(file_out, PAD_BYTE, offset - base_size)  # Pad to the specified offset
 
         with open(append_path, 'rb') as file_append:
-            temp_file.write(file_append.read())  # Append the additional file content
-
-        temp_path = temp_file.name
-
-    final_size = Path(temp_path).stat().st_size
-    alignment_padding = (imgtool_args.align - (final_size % imgtool_args.align)) % imgtool_args.align
+            copy_range(file_append, file_out, 0, os.fstat(file_append.fileno()).st_size)  # Append the additional file content
 
-    with open(temp_path, 'ab') as file_out:
-        file_out.write(PAD_BYTE * alignment_padding)
-
-    # Replace the original file with the temporary file
-    shutil.move(temp_path, output_path)
+        final_size = file_out.tell()
+        alignment_padding = (imgtool_args.align - (final_size % imgtool_args.align)) % imgtool_args.align
+        write_padding(file_out, PAD_BYTE, alignment_padding)
 
     if imgtool_args.verbose:
         print(f"Appended {append_path} to {base_path} at offset {offset}(0x{offset:x}), aligned to {imgtool_args.align}-byte boundary. Final size: {final_size + alignment_padding}(0x{(final_size + alignment_padding):x}) bytes.")
@@ -85,30 +172,21 @@ def append_to_file(base_path, append_path, output_path, offset, imgtool_args):
 def merge_files(base_path, insert_path, output_path, merge_offset, imgtool_args):
     """Merge one file into another at specified offset and align the final output, handling same input and output paths safely."""
     merge_offset = parse_hexadecimal(merge_offset)
-    base_size = Path(base_path).stat().st_size
-    insert_size = Path(insert_path).stat().st_size
-    PAD_BYTE = bytes([int(imgtool_args.pad_byte, 16)])
+    base_size = os.stat(base_path).st_size
+    PAD_BYTE = imgtool_args.pad_byte_bytes
 
     if base_size < merge_offset:
         raise ValueError(f"Base file {base_size}(0x{base_size:x}) bytes must be larger than the insert file {merge_offset}(0x{merge_offset:x}) offset.")
 
-    with NamedTemporaryFile(delete=False) as temp_file:
+    with open_output(output_path, base_path, insert_path) as file_out:
         with open(base_path, 'rb') as file_base, open(insert_path, 'rb') as file_insert:
-            temp_file.write(file_base.read(merge_offset))  # Write up to the merge offset
-            temp_file.write(file_insert.read())  # Insert the new file content
-            file_base.seek(merge_offset)  # Skip the replaced part in the original
-            temp_file.write(file_base.read())  # Continue writing the rest
-
-        temp_path = temp_file.name
+            copy_range(file_base, file_out, 0, merge_offset)  # Write up to the merge offset
+            copy_range(file_insert, file_out, 0, os.fstat(file_insert.fileno()).st_size)  # Insert the new file content
+            copy_range(file_base, file_out, merge_offset, base_size - merge_offset)  # Continue writing the rest
 
-    final_size = Path(temp_path).stat().st_size
-    alignment_padding = (imgtool_args.align - (final_size % imgtool_args.align)) % imgtool_args.align
-
-    with open(temp_path, 'ab') as file_out:
-        file_out.write(PAD_BYTE * alignment_padding)
-
-    # Replace the original file with the temporary file
-    shutil.move(temp_path, output_path)
+        final_size = file_out.tell()
+        alignment_padding = (imgtool_args.align - (final_size % imgtool_args.align)) % imgtool_args.align
+        write_padding(file_out, PAD_BYTE, alignment_padding)
 
     if imgtool_args.verbose:
         print(f"Merged {insert_path} into {base_path} at offset {merge_offset}(0x{merge_offset:x}). Final size: {final_size + alignment_padding}(0x{(final_size + alignment_padding):x}) bytes.")
@@ -117,66 +195,71 @@ def merge_files(base_path, insert_path, output_path, merge_offset, imgtool_args)
 def replace_file(base_path, replace_path, output_path, replace_offset, imgtool_args):
     """Replace a portion of the base file with the replace file starting from the specified offset. Handles same input and output paths safely."""
     replace_offset = parse_hexadecimal(replace_offset)
-    base_size = Path(base_path).stat().st_size
-    replace_size = Path(replace_path).stat().st_size
-    PAD_BYTE = bytes([int(imgtool_args.pad_byte, 16)])
+    base_size = os.stat(base_path).st_size
+    replace_size = os.stat(replace_path).st_size
+    PAD_BYTE = imgtool_args.pad_byte_bytes
 
     if base_size < replace_offset + replace_size:
         raise ValueError(f"Base file {base_size}(0x{base_size:x}) bytes must be larger than the sum of replace offset {replace_offset}(0x{replace_offset:x}) and replace file size {replace_size}(0x{replace_size:x}).")
 
-    # Use a temporary file to safely handle when base_path and output_path are the same
-    with NamedTemporaryFile(delete=False) as temp_file:
+    # open_output() stages through a temporary file when base_path and output_path are the same
+    with open_output(output_path, base_path, replace_path) as file_out:
         with open(base_path, 'rb') as file_base, open(replace_path, 'rb') as file_replace:
-            # Write base file content up to the replace offset to the temp file
-            temp_file.write(file_base.read(replace_offset))
+            # Write base file content up to the replace offset
+            copy_range(file_base, file_out, 0, replace_offset)
             # Write the replace file content
-            temp_file.write(file_replace.read())
-            # Move file pointer past the replaced portion
-            file_base.seek(replace_offset + replace_size)
-            # Write the remaining base file content
-            temp_file.write(file_base.read())
-
-        temp_file_path = temp_file.name
-
-    # Compute final size and alignment
-    final_size = base_size
-    alignment_padding = (imgtool_args.align - (final_size % imgtool_args.align)) % imgtool_args.align
-
-    # Add alignment padding and finalize the temporary file
-    with open(temp_file_path, 'ab') as file_out:
-        file_out.write(PAD_BYTE * alignment_padding)
+            copy_range(file_replace, file_out, 0, replace_size)
+            # Write the remaining base file content, skipping the replaced portion
+            copy_range(file_base, file_out, replace_offset + replace_size, base_size - replace_offset - replace_size)
 
-    # Replace the original file with the temporary file
-    shutil.move(temp_file_path, output_path)
+        # Compute final size and add alignment padding
+        final_size = base_size
+        alignment_padding = (imgtool_args.align - (final_size % imgtool_args.align)) % imgtool_args.align
+        write_padding(file_out, PAD_BYTE, alignment_padding)
 
     if imgtool_args.verbose:
         print(f"Replaced {base_path} with {replace_path} starting from offset {replace_offset}(0x{replace_offset:x}). Final size: {final_size + alignment_padding}(0x{(final_size + alignment_padding):x}) bytes.")
 
 
 
-def calculate_crc32(data):
-    """Calculate CRC32 of the given data."""
-    return zlib.crc32(data) & 0xFFFFFFFF
+def calculate_crc32(data, crc=0):
+    """Calculate CRC32 of the given data, continuing from a previous CRC32 value."""
+    return zlib.crc32(data, crc) & 0xFFFFFFFF
 
-def calculate_checksum(data):
-    """Calculate simple checksum of the given data."""
-    return sum(data) & 0xFFFFFFFF
+def calculate_checksum(data, checksum=0):
+    """Calculate simple checksum of the given data, continuing from a previous checksum value."""
+    if np is not None:
+        data_sum = int(np.frombuffer(data, dtype=np.uint8).sum(dtype=np.uint64))
+    else:
+        data_sum = sum(data)
+    return (checksum + data_sum) & 0xFFFFFFFF
 
 def sign_file(input_path, signature_type, opt_append, imgtool_args):
-    with open(input_path, 'rb') as file:
-        data = file.read()
-
-    signatures = {}
+    calculators = {}
     if signature_type.lower() == 'all':
-        signatures['crc32'] = calculate_crc32(data)
-        signatures['byte(x8)'] = calculate_checksum(data)  # Assuming checksum returns byte(x8) checksum
+        calculators['crc32'] = calculate_crc32
+        calculators['byte(x8)'] = calculate_checksum  # Assuming checksum returns byte(x8) checksum
     elif signature_type.lower() == 'crc32':
-        signatures['crc32'] = calculate_crc32(data)
+        calculators['crc32'] = calculate_crc32
     elif signature_type.lower() == 'byte':
-        signatures['byte(x8)'] = calculate_checksum(data)
+        calculators['byte(x8)'] = calculate_checksum
     else:
         raise ValueError(f"Unsupported signature type: {signature_type}")
 
+    # Stream the input through a reusable chunk buffer, updating every signature per chunk
+    signatures = dict.fromkeys(calculators, 0)
+    data_size = 0
+    chunk_buffer = memoryview(bytearray(IO_CHUNK_SIZE))
+    with open(input_path, 'rb') as file:
+        while True:
+            read_size = file.readinto(chunk_buffer)
+            if not read_size:
+                break
+            chunk = chunk_buffer[:read_size]
+            for sig_type, calculate in calculators.items():
+                signatures[sig_type] = calculate(chunk, signatures[sig_type])
+            data_size += read_size
+
     for sig_type, sig_value in signatures.items():
         signature_name = sig_type.upper()
         signature_bytes = struct.pack('<I', sig_value)  # Adjust format as necessary
@@ -185,16 +268,16 @@ def sign_file(input_path, signature_type, opt_append, imgtool_args):
         if str(opt_append).lower() == 'append':
             base_name, ext = os.path.splitext(input_path)
             modified_output_path = f"{base_name}_{sig_type}{ext}"
-            with open(modified_output_path, 'wb') as file:
-                file.write(data)
+            shutil.copyfile(input_path, modified_output_path)
+            with open(modified_output_path, 'ab') as file:
                 file.write(signature_bytes)  # Append 4-byte signature in little-endian format
 
         if imgtool_args.verbose:
             print(f"Signature value for {signature_name}: 0x{sig_value:08X}")
             if opt_append:
                 print(f"Signed file written to: {modified_output_path}")
-                print(f"Original size: {len(data)} bytes: {hex(len(data))}")
-                print(f"Final size: {len(data) + 4} bytes {hex(len(data)+4)}")
+                print(f"Original size: {data_size} bytes: {hex(data_size)}")
+                print(f"Final size: {data_size + 4} bytes {hex(data_size+4)}")
 
 
 def main():
@@ -40,7 +40,15 @@ class ImgToolArgs:
         self.parser.add_argument('-c', '--pad_byte', default='0x00', help='Padding byte (default: 0x00).')
 
     def parse_args(self):
-        return self.parser.parse_args()
+        args = self.parser.parse_args()
+
+        # Convert the padding byte once, the image operations use the bytes value directly
+        try:
+            args.pad_byte_bytes = bytes([int(args.pad_byte, 16)])
+        except ValueError:
+            self.parser.error(f"Invalid padding byte: {args.pad_byte}")
+
+        return args
 
 # if __name__ == "__main__":
 #     args = ImgToolArgs().parse_args()